@@ -2,14 +2,19 @@ import streamlit as st  # Only import Streamlit first
 import os
 import json
 import datetime
+import uuid
 
 # --- CONFIG (MUST BE THE FIRST STREAMLIT COMMAND) ---
 st.set_page_config(page_title="Legal AI Assistant", layout="wide", page_icon="⚖️")
 
 # --- CUSTOM IMPORTS (Move these BELOW set_page_config) ---
-from processor import extract_text, segment_into_clauses, process_multilingual_clause, get_entities
-from legal_engine import get_risk_assessment, calculate_overall_risk, classify_contract, generate_executive_summary, get_chat_response
-from utils import format_entities, generate_pdf_report
+from processor import extract_text, get_entities
+from legal_engine import classify_contract
+from chat import build_context, stream_chat_response
+from jobs import analyze_document
+from doc_cache import document_cache, fingerprint
+from utils import format_entities
+from records import ClauseType, SCRATCH_DIR, sweep_folders
 
 # --- CSS STYLING ---
 st.markdown("""
@@ -18,6 +23,7 @@ st.markdown("""
     .risk-high {background-color: #ffe6e6; border-left: 5px solid #ff4b4b; padding: 15px; border-radius: 5px; margin-bottom: 10px;}
     .risk-medium {background-color: #fff4e5; border-left: 5px solid #ffa421; padding: 15px; border-radius: 5px; margin-bottom: 10px;}
     .risk-low {background-color: #e6f9e6; border-left: 5px solid #09ab3b; padding: 15px; border-radius: 5px; margin-bottom: 10px;}
+    .risk-unknown {background-color: #f5f5f5; border-left: 5px solid #9e9e9e; padding: 15px; border-radius: 5px; margin-bottom: 10px;}
     
     /* Modality Badges */
     .badge {
@@ -40,17 +46,17 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --- HELPER FUNCTIONS ---
-def save_audit_log(doc_type, risk_score, results):
+def save_audit_log(report):
     if not os.path.exists("audit_logs"): os.makedirs("audit_logs")
     log_entry = {
         "timestamp": datetime.datetime.now().isoformat(),
-        "document_type": doc_type,
-        "risk_score": risk_score,
-        "detailed_analysis": results
+        "document_type": report.doc_type,
+        "risk_score": report.risk_score,
+        "detailed_analysis": report.results()
     }
-    filename = f"audit_logs/log_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    # The uuid suffix keeps two sessions finishing in the same second from overwriting each other
+    filename = f"audit_logs/log_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}.json"
     with open(filename, "w") as f: json.dump(log_entry, f, indent=4)
-    return json.dumps(log_entry, indent=4)
 
 def count_knowledge_base():
     if not os.path.exists("audit_logs"): return 0
@@ -65,28 +71,39 @@ with st.sidebar:
     uploaded_file = st.file_uploader("📂 Upload Contract", type=['pdf', 'docx', 'txt'])
 
 # --- STATE INITIALIZATION ---
-if 'analysis_results' not in st.session_state: st.session_state.analysis_results = None
-if 'audit_json' not in st.session_state: st.session_state.audit_json = None
-if 'pdf_bytes' not in st.session_state: st.session_state.pdf_bytes = None
-if 'summary' not in st.session_state: st.session_state.summary = None # Fixed crash
+if 'report' not in st.session_state: st.session_state.report = None # AnalysisReport (records.py)
+if 'downloads_ready' not in st.session_state: st.session_state.downloads_ready = False
 
 if uploaded_file:
     # 1. PROCESS FILE
-    if 'contract_text' not in st.session_state or st.session_state.get('last_file') != uploaded_file.name:
-        file_ext = os.path.splitext(uploaded_file.name)[1].lower()
-        raw_text = extract_text(uploaded_file, file_ext)
+    # Keyed on the file's content, not its name (same name can mean a new draft, a new name can be the same contract)
+    doc_key = fingerprint(uploaded_file.getvalue())
+    if 'contract_text' not in st.session_state or st.session_state.get('doc_key') != doc_key:
+        cached = document_cache.get(doc_key)
+        st.session_state.doc_key = doc_key
+        st.session_state.messages = [] # Chat history belongs to one document
+        st.session_state.chat_context = None # built on the first question, then reused every turn
+        st.session_state.downloads_ready = False
+        sweep_folders(SCRATCH_DIR) # day-old download folders of reports whose cache entry was evicted
         
-        # Save to state
-        st.session_state.contract_text = raw_text
-        st.session_state.doc_type = classify_contract(raw_text)
-        st.session_state.entities = format_entities(get_entities(raw_text))
-        st.session_state.last_file = uploaded_file.name
-        
-        # Reset analysis on new file
-        st.session_state.analysis_results = None
-        st.session_state.pdf_bytes = None
-        st.session_state.audit_json = None
-        st.session_state.summary = None
+        if cached:
+            # Finished analysis from any earlier upload of the same bytes
+            if cached.entities is None: cached.entities = format_entities(get_entities(cached.text))
+            st.session_state.report = cached
+            st.session_state.contract_text = cached.text
+            st.session_state.doc_type = cached.doc_type
+            st.session_state.entities = cached.entities
+        else:
+            file_ext = os.path.splitext(uploaded_file.name)[1].lower()
+            raw_text = extract_text(uploaded_file, file_ext)
+            
+            # Save to state
+            st.session_state.contract_text = raw_text
+            st.session_state.doc_type = classify_contract(raw_text)
+            st.session_state.entities = format_entities(get_entities(raw_text))
+            
+            # Reset analysis on new file
+            st.session_state.report = None
 
     # 2. DASHBOARD HEADER
     st.title(f"📄 Analysis: {st.session_state.doc_type}")
@@ -100,83 +117,74 @@ if uploaded_file:
 
     # --- TAB 1: RISK AUDIT ---
     with tab1:
-        if st.button("⚡ Run Deep Legal Analysis") or st.session_state.analysis_results:
+        if st.button("⚡ Run Deep Legal Analysis") or st.session_state.report:
             
             # A. EXECUTE ANALYSIS (If not already done)
-            if not st.session_state.analysis_results:
-                clauses = segment_into_clauses(st.session_state.contract_text)
-                results = []
+            if not st.session_state.report:
                 bar = st.progress(0)
                 
                 with st.spinner("⚖️ Identifying Obligations, Rights & Ambiguities..."):
-                    for i, c in enumerate(clauses):
-                        clean_text, _ = process_multilingual_clause(c['content'])
-                        analysis = get_risk_assessment(clean_text)
-                        
-                        # Store everything needed for display
-                        results.append({
-                            "header": c['header'], 
-                            "analysis": analysis, 
-                            "original": c['content']
-                        })
-                        bar.progress((i + 1) / len(clauses))
+                    report = analyze_document(st.session_state.contract_text, on_progress=lambda done, total: bar.progress(done / total),
+                                              doc_type=st.session_state.doc_type, entities=st.session_state.entities)
                 
-                # Save results to state
-                st.session_state.analysis_results = results
-                st.session_state.risk_score = calculate_overall_risk(results)
-                st.session_state.summary = generate_executive_summary(st.session_state.contract_text)
-            
-            # B. GENERATE REPORTS (If not already done)
-            if not st.session_state.pdf_bytes:
-                st.session_state.audit_json = save_audit_log(st.session_state.doc_type, st.session_state.risk_score, st.session_state.analysis_results)
-                st.session_state.pdf_bytes = generate_pdf_report(st.session_state.doc_type, st.session_state.summary, st.session_state.analysis_results, st.session_state.risk_score)
+                # Save to state, knowledge base and the shared document cache (PDF/JSON are built on download)
+                st.session_state.report = report
+                save_audit_log(report)
+                if report.is_complete(): document_cache.put(st.session_state.doc_key, report)
+
+            report = st.session_state.report
 
-            # C. DISPLAY RESULTS
+            # B. DISPLAY RESULTS
             
             # 1. Risk Score
-            score = st.session_state.risk_score
-            color = "#ff4b4b" if score > 70 else "#ffa421" if score > 30 else "#09ab3b"
-            st.markdown(f'<div style="text-align:center"><h1 style="color:{color}; font-size:64px; margin:0">{score}/100</h1><p>Risk Score</p></div>', unsafe_allow_html=True)
+            score = report.risk_score
+            if score is None:
+                st.markdown('<div style="text-align:center"><h1 style="color:#9e9e9e; font-size:40px; margin:0">Not scored / manual review</h1><p>Risk Score</p></div>', unsafe_allow_html=True)
+            else:
+                color = "#ff4b4b" if score > 70 else "#ffa421" if score > 30 else "#09ab3b"
+                st.markdown(f'<div style="text-align:center"><h1 style="color:{color}; font-size:64px; margin:0">{score}/100</h1><p>Risk Score</p></div>', unsafe_allow_html=True)
+            if report.scored_count() < len(report.clauses):
+                st.warning(f"{report.scored_count()} of {len(report.clauses)} clauses scored; the rest need manual review.")
+            q = report.output_quality()
+            st.caption(f"Model output: {q['clean']} clean · {q['repaired']} repaired locally · {q['reasked']} re-asked · {q['failed']} incomplete (manual review)")
             
             # 2. Executive Summary
             with st.expander("📄 Executive Summary", expanded=True):
-                st.write(st.session_state.summary)
+                st.write(report.summary)
 
             # 3. Checklist
             st.subheader("📋 Key Clause Checklist")
-            def check(keyword):
-                for r in st.session_state.analysis_results:
-                    if keyword.lower() in r['analysis'].get('clause_type', '').lower(): return True
-                return False
+            check = report.has_type
             
             c1, c2, c3 = st.columns(3)
-            c1.markdown(f"{'✅' if check('Indemnity') else '❌'} **Indemnity**")
-            c1.markdown(f"{'✅' if check('Termination') else '❌'} **Termination**")
-            c2.markdown(f"{'✅' if check('Non-Compete') else '❌'} **Non-Compete**")
-            c2.markdown(f"{'✅' if check('Auto-Renewal') else '❌'} **Auto-Renewal**")
-            c3.markdown(f"{'✅' if check('Penalty') else '❌'} **Penalty Clauses**")
-            c3.markdown(f"{'✅' if check('Lock-in') else '❌'} **Lock-in Period**")
+            c1.markdown(f"{'✅' if check(ClauseType.INDEMNITY) else '❌'} **Indemnity**")
+            c1.markdown(f"{'✅' if check(ClauseType.TERMINATION) else '❌'} **Termination**")
+            c2.markdown(f"{'✅' if check(ClauseType.NON_COMPETE) else '❌'} **Non-Compete**")
+            c2.markdown(f"{'✅' if check(ClauseType.AUTO_RENEWAL) else '❌'} **Auto-Renewal**")
+            c3.markdown(f"{'✅' if check(ClauseType.PENALTY) else '❌'} **Penalty Clauses**")
+            c3.markdown(f"{'✅' if check(ClauseType.LOCK_IN) else '❌'} **Lock-in Period**")
 
             st.divider()
             
             # 4. Detailed Clause-by-Clause Analysis
             st.subheader("🧐 Clause-by-Clause Analysis")
             
-            for r in st.session_state.analysis_results:
+            for c in report.clauses:
                 # Extract Data
-                risk = r['analysis'].get('label', 'Low')
-                ctype = r['analysis'].get('clause_type', 'General')
-                modality = r['analysis'].get('modality', 'OBLIGATION').upper()
-                ambiguous = r['analysis'].get('is_ambiguous', False)
-                deviation = r['analysis'].get('deviation', 'Standard')
-                law = r['analysis'].get('legal_reference', 'Indian Contract Act, 1872')
+                risk = c.label.value
+                ctype = c.clause_type.value
+                modality = c.modality.value
+                ambiguous = c.is_ambiguous
+                deviation = c.deviation
+                law = c.legal_reference
                 
-                # Smart Title Logic (AI Title -> Type -> Original Header)
-                smart_title = r['analysis'].get('clause_title', r['header'])
+                # Smart Title Logic (AI Title -> Original Header)
+                smart_title = c.title
                 
                 # HTML Badges
                 modality_html = f'<span class="badge badge-{modality.lower()}">{modality}</span>'
                 ambig_html = '<span class="badge badge-ambiguous">⚠️ AMBIGUOUS</span>' if ambiguous else ""
+                if c.unresolved: ambig_html += f' <span class="badge badge-ambiguous">⚠️ UNVERIFIED ({c.unresolved})</span>'
                 
                 # Render Card
                 with st.expander(f"[{risk.upper()}] {smart_title}"):
@@ -185,14 +193,14 @@ if uploaded_file:
                     
                     with col_orig:
                         st.caption("📝 Original Text")
-                        st.info(r['original'])
+                        st.info(report.clause_text(c))
                     
                     with col_ana:
                         st.caption("🤖 Legal Analysis")
                         st.markdown(f"""
                             <div class="risk-{risk.lower()}">
                                 <p><b>Category:</b> {ctype} {modality_html} {ambig_html}</p>
-                                <p><b>Risk:</b> {r['analysis']['explanation']}</p>
+                                <p><b>Risk:</b> {c.explanation}</p>
                                 <p><b>🏛️ Law:</b> <b>{law}</b></p>
                                 <p><b>📉 Deviation:</b> <i>{deviation}</i></p>
                             </div>
@@ -200,14 +208,16 @@ if uploaded_file:
                         
                         # Improvement Suggestion
                         if risk != "Low":
-                            st.success(f"**Better Alternative:** {r['analysis']['alternative_clause']}")
+                            st.success(f"**Better Alternative:** {c.alternative_clause}")
 
             st.divider()
             
-            # 5. Downloads
-            d1, d2 = st.columns(2)
-            with d1: st.download_button("📄 Download PDF Report", st.session_state.pdf_bytes, "Report.pdf", "application/pdf")
-            with d2: st.download_button("📊 Download JSON Log", st.session_state.audit_json, "audit_log.json", "application/json")
+            # 5. Downloads (built on first request, then reused by this session and the document cache)
+            if st.session_state.downloads_ready or st.button("📥 Prepare Downloads"):
+                st.session_state.downloads_ready = True
+                d1, d2 = st.columns(2)
+                with d1: st.download_button("📄 Download PDF Report", report.pdf_bytes(), "Report.pdf", "application/pdf")
+                with d2: st.download_button("📊 Download JSON Log", report.audit_json(), "audit_log.json", "application/json")
 
     # --- TAB 2: CHAT ASSISTANT ---
     with tab2:
@@ -230,8 +240,9 @@ if uploaded_file:
                 st.markdown(prompt)
 
             with st.chat_message("assistant"):
-                response = get_chat_response(st.session_state.contract_text, prompt)
-                st.markdown(response)
+                history = st.session_state.messages[:-1]
+                if st.session_state.get("chat_context") is None: st.session_state.chat_context = build_context(st.session_state.contract_text)
+                response = st.write_stream(stream_chat_response(st.session_state.chat_context, history, prompt))
             st.session_state.messages.append({"role": "assistant", "content": response})
 
     # --- TAB 3: TEMPLATES ---
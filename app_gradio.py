@@ -1,9 +1,11 @@
 import gradio as gr
 import os
-import json
-from processor import extract_text, segment_into_clauses, process_multilingual_clause
-from legal_engine import get_risk_assessment, calculate_overall_risk, classify_contract, generate_executive_summary, get_chat_response
-from utils import generate_pdf_report
+import time
+from chat import build_context, stream_chat_response
+from jobs import JobQueue
+from doc_cache import document_cache, fingerprint
+from records import ClauseType, scratch_dir
+from structured import quality_stats
 
 # --- HELPER: KNOWLEDGE BASE COUNTER ---
 def count_knowledge_base():
@@ -44,6 +46,7 @@ custom_css = """
 .risk-high { background-color: #ffebee; border-left: 5px solid #ff4b4b; color: #c62828; }
 .risk-medium { background-color: #fff3e0; border-left: 5px solid #ffa421; color: #ef6c00; }
 .risk-low { background-color: #e8f5e9; border-left: 5px solid #4caf50; color: #2e7d32; }
+.risk-unknown { background-color: #f5f5f5; border-left: 5px solid #9e9e9e; color: #616161; }
 
 /* Grid Layouts */
 .split-view { display: flex; flex-direction: row; }
@@ -71,51 +74,82 @@ custom_css = """
 }
 """
 
-def process_file_wrapper(file_obj):
+job_queue = JobQueue()
+
+def get_queue_html(job_id=None):
+    m = job_queue.metrics()
+    q = quality_stats()
+    status = job_queue.status(job_id) if job_id else None
+    line = ""
+    if status and status["state"] == "queued":
+        line = f"Position {status['position']} in queue"
+    elif status and status["state"] == "running":
+        done, total = status["progress"]
+        line = f"Analyzing clause {done}/{total}" if total else "Reading contract..."
+    return f"""
+    <div style="font-size: 12px; color: #666;">
+        <div>{line}</div>
+        <div>Queue: {m['queue_depth']} waiting · {m['running']}/{m['workers']} workers busy · avg wait {m['avg_wait_seconds']}s</div>
+        <div>LLM output: {q['repaired_rate']:.0%} repaired locally · {q['reasked_rate']:.0%} re-asked · {q['failed_rate']:.0%} failed</div>
+    </div>
+    """
+
+def process_file_wrapper(file_obj, request: gr.Request):
     # Retrieve current stats if no file is uploaded
     current_sidebar = get_sidebar_html()
     
     if file_obj is None: 
-        return "Please upload a file.", None, None, None, current_sidebar
+        yield "Please upload a file.", None, None, None, current_sidebar, None, get_queue_html()
+        return
 
-    # 1. READ
     file_path = file_obj.name
     file_ext = os.path.splitext(file_path)[1].lower()
-    with open(file_path, "rb") as f: raw_text = extract_text(f, file_ext)
+    with open(file_path, "rb") as f: cache_key = fingerprint(f.read())
+    cached = document_cache.get(cache_key)
 
-    # 2. ANALYZE
-    doc_type = classify_contract(raw_text)
-    clauses = segment_into_clauses(raw_text)
-    results = []
-    
-    for c in clauses:
-        clean_text, _ = process_multilingual_clause(c['content'])
-        analysis = get_risk_assessment(clean_text)
-        results.append({"header": c['header'], "analysis": analysis, "original": c['content']})
-
-    # 3. SCORE & SUMMARY
-    risk_score = calculate_overall_risk(results)
-    summary = generate_executive_summary(raw_text)
-    
-    # 4. SAVE (This increases the count)
-    log_data = {"doc_type": doc_type, "risk_score": risk_score, "analysis": results}
-    json_path = "audit_log.json"
-    with open(json_path, "w") as f: json.dump(log_data, f, indent=4)
-        
-    pdf_bytes = generate_pdf_report(doc_type, summary, results, risk_score)
-    pdf_path = "Legal_AI_Report.pdf"
-    with open(pdf_path, "wb") as f: f.write(pdf_bytes)
+    if cached:
+        # 1. CACHE HIT (same bytes already analyzed by anyone, same pipeline/prompt version)
+        report = cached
+    else:
+        # 1. SUBMIT (the worker pool reads and analyzes; downloads are built later, on request)
+        user_id = request.session_hash if request else "anonymous"
+        job_id = job_queue.submit(user_id, file_path, file_ext, cache_key=cache_key)
+
+        # 2. POLL
+        while True:
+            status = job_queue.status(job_id)
+            if status["state"] in ("done", "failed", "cancelled"): break
+            yield gr.update(), None, None, gr.update(), current_sidebar, job_id, get_queue_html(job_id)
+            time.sleep(0.5)
+
+        if status["state"] != "done":
+            msg = "Analysis cancelled." if status["state"] == "cancelled" else f"Analysis failed: {status['error']}"
+            yield msg, None, None, gr.update(), get_sidebar_html(), None, get_queue_html()
+            return
+
+        report = job_queue.get(job_id).report
 
-    # 5. REFRESH SIDEBAR STATS
+    doc_type, risk_score, summary = report.doc_type, report.risk_score, report.summary
+    quality = report.output_quality()
+
+    # 3. REFRESH SIDEBAR STATS
     new_sidebar_html = get_sidebar_html()
 
-    # 6. HTML REPORT
-    color = "#ff4b4b" if risk_score > 70 else "#ffa421" if risk_score > 30 else "#09ab3b"
+    # 4. HTML REPORT
+    if risk_score is None:
+        score_html = '<h1 style="font-size: 40px; margin: 0; color: #9e9e9e;">Not scored / manual review</h1>'
+    else:
+        color = "#ff4b4b" if risk_score > 70 else "#ffa421" if risk_score > 30 else "#09ab3b"
+        score_html = f'<h1 style="font-size: 64px; margin: 0; color: {color};">{risk_score}/100</h1>'
+    scored = report.scored_count()
+    coverage = f'<p style="font-size: 14px; color: #e65100;">{scored} of {len(report.clauses)} clauses scored</p>' if scored < len(report.clauses) else ""
     
     html = f"""
     <div style="text-align: center; margin-bottom: 25px;">
-        <h1 style="font-size: 64px; margin: 0; color: {color};">{risk_score}/100</h1>
+        {score_html}
         <p style="font-size: 16px; color: #666;">Risk Score</p>
+        {coverage}
+        <p style="font-size: 12px; color: #999;">Model output: {quality['clean']} clean · {quality['repaired']} repaired locally · {quality['reasked']} re-asked · {quality['failed']} incomplete (manual review)</p>
         <span style="background: #f0f0f0; padding: 5px 12px; border-radius: 15px; font-weight: bold;">{doc_type}</span>
     </div>
     
@@ -126,36 +160,36 @@ def process_file_wrapper(file_obj):
     """
 
     # Checklist
-    def check(kw): 
-        return any(kw.lower() in r['analysis'].get('clause_type','').lower() or kw.lower() in r['header'].lower() for r in results)
+    def check(ctype): 
+        return report.has_type(ctype) or any(ctype.value.lower() in c.header.lower() for c in report.clauses)
     
-    items = ["Indemnity", "Termination", "Non-Compete", "Auto-Renewal", "Penalty", "Lock-in"]
+    items = [ClauseType.INDEMNITY, ClauseType.TERMINATION, ClauseType.NON_COMPETE, ClauseType.AUTO_RENEWAL, ClauseType.PENALTY, ClauseType.LOCK_IN]
     html += "<h3>📋 Key Clause Checklist</h3><div class='checklist-grid'>"
     for item in items:
         icon = "✅" if check(item) else "❌"
-        html += f"<div class='check-item'>{icon} {item}</div>"
+        html += f"<div class='check-item'>{icon} {item.value}</div>"
     html += "</div><h3>🧐 Clause-by-Clause Analysis</h3>"
     
     # Cards
-    for r in results:
-        data = r['analysis']
-        label = data.get('label', 'Low').upper()
-        title = data.get('clause_title', r['header'])
-        explanation = data.get('explanation', '')
-        law = data.get('legal_reference', 'Indian Contract Act, 1872')
-        modality = data.get('modality', 'OBLIGATION').upper()
-        deviation = data.get('deviation', 'Standard')
+    for c in report.clauses:
+        label = c.label.value.upper()
+        title = c.title
+        explanation = c.explanation
+        law = c.legal_reference
+        modality = c.modality.value
+        deviation = c.deviation
         
         card_class = f"risk-card risk-{label.lower()}"
         badge_class = f"badge-{modality.lower()}"
+        unverified = f' <span class="badge">⚠️ UNVERIFIED ({c.unresolved})</span>' if c.unresolved else ""
         
         html += f"""
         <div class="{card_class}">
             <div class="risk-header">
-                <span>[{label}] {title} <span class="badge {badge_class}">{modality}</span></span>
+                <span>[{label}] {title} <span class="badge {badge_class}">{modality}</span>{unverified}</span>
             </div>
             <div class="split-view">
-                <div class="col-original">{r['original']}</div>
+                <div class="col-original">{report.clause_text(c)}</div>
                 <div class="col-analysis">
                     <div style="margin-bottom: 8px;"><b>⚠️ Risk:</b> {explanation}</div>
                     <div style="margin-bottom: 8px;"><b>🏛️ Law:</b> {law}</div>
@@ -164,19 +198,36 @@ def process_file_wrapper(file_obj):
             </div>
         """
         if label != "LOW":
-            alt = data.get('alternative_clause', 'N/A')
+            alt = c.alternative_clause or 'N/A'
             html += f"<div class='better-box'><b>✅ Better Alternative:</b><br>{alt}</div>"
         html += "</div>"
 
-    return html, json_path, pdf_path, raw_text, new_sidebar_html
+    yield html, None, None, report, new_sidebar_html, None, get_queue_html()
+
+def download_wrapper(report):
+    """Builds (or reuses) the audit JSON and PDF only when someone asks for them."""
+    if report is None: return None, None
+    if not report.artifact_dir: report.artifact_dir = scratch_dir("report_")
+    return report.artifact_paths()
+
+def cancel_wrapper(job_id):
+    if job_id: job_queue.cancel(job_id)
+    return get_queue_html()
 
-def chat_wrapper(message, history, context):
-    if not context: return "Please analyze a contract first."
-    return get_chat_response(context, message)
+def chat_wrapper(message, history, report):
+    if not report:
+        yield "Please analyze a contract first."
+        return
+    if report.chat_context is None: report.chat_context = build_context(report.text)
+    answer = ""
+    for piece in stream_chat_response(report.chat_context, history, message):
+        answer += piece
+        yield answer
 
 def template_wrapper(template_type):
     content = f"STANDARD {template_type.upper()} TEMPLATE\n\n(Generated by Legal AI Assistant)\n"
-    path = f"{template_type.replace(' ', '_')}.txt"
+    # Own temp folder per request so two users never overwrite each other's file
+    path = os.path.join(scratch_dir("template_"), f"{template_type.replace(' ', '_')}.txt")
     with open(path, "w") as f: f.write(content)
     return path
 
@@ -184,6 +235,7 @@ def template_wrapper(template_type):
 with gr.Blocks(title="Legal AI Assistant", css=custom_css, theme=gr.themes.Soft()) as demo:
     
     contract_state = gr.State()
+    job_state = gr.State()
 
     with gr.Row():
         
@@ -197,9 +249,12 @@ with gr.Blocks(title="Legal AI Assistant", css=custom_css, theme=gr.themes.Soft(
             gr.Markdown("### 📂 Upload Contract")
             file_input = gr.File(label="", file_types=[".pdf", ".docx", ".txt"])
             btn_analyze = gr.Button("⚡ Run Analysis", variant="primary")
+            btn_cancel = gr.Button("✖ Cancel", size="sm")
+            queue_stats = gr.HTML(get_queue_html())
             
             gr.Markdown("---")
             gr.Markdown("### 📥 Downloads")
+            btn_downloads = gr.Button("Prepare PDF & JSON", size="sm")
             dl_pdf = gr.File(label="PDF Report")
             dl_json = gr.File(label="JSON Log")
 
@@ -221,8 +276,13 @@ with gr.Blocks(title="Legal AI Assistant", css=custom_css, theme=gr.themes.Soft(
     btn_analyze.click(
         process_file_wrapper, 
         inputs=[file_input], 
-        outputs=[report_view, dl_json, dl_pdf, contract_state, sidebar_stats]
+        outputs=[report_view, dl_json, dl_pdf, contract_state, sidebar_stats, job_state, queue_stats],
+        concurrency_limit=None  # handlers only poll; the JobQueue pool bounds the real work
     )
+    # A new analysis starts a new conversation; old answers were about the previous contract
+    btn_analyze.click(lambda: ([], []), None, [chatbot.chatbot, chatbot.chatbot_state], queue=False)
+    btn_cancel.click(cancel_wrapper, inputs=[job_state], outputs=[queue_stats])
+    btn_downloads.click(download_wrapper, inputs=[contract_state], outputs=[dl_json, dl_pdf])
 
 if __name__ == "__main__":
-    demo.launch()
\ No newline at end of file
+    demo.queue(default_concurrency_limit=None).launch()
\ No newline at end of file
@@ -0,0 +1,184 @@
+import os
+import json
+import time
+import random
+import threading
+from collections import deque
+
+# Rupees per 1K tokens (roughly Groq list prices for llama-3.1-8b and llama-3.3-70b)
+FAST_COST = float(os.getenv("LEGAL_AI_FAST_COST", 0.006))
+STRONG_COST = float(os.getenv("LEGAL_AI_STRONG_COST", 0.06))
+MIN_CONFIDENCE = float(os.getenv("LEGAL_AI_MIN_CONFIDENCE", 0.6))
+# Transport failures (429s, timeouts) are retried on the same tier before escalating
+BACKEND_RETRIES = int(os.getenv("LEGAL_AI_BACKEND_RETRIES", 2))
+BACKEND_BACKOFF = float(os.getenv("LEGAL_AI_BACKEND_BACKOFF", 1.0))
+
+# Reasons that mean the answer itself is unusable or untrustworthy. "high_risk" and "ambiguous"
+# only buy a second opinion; a clean last-tier answer for them stands as is.
+UNRESOLVED_REASONS = ("invalid_json", "incomplete", "low_confidence", "backend_error")
+
+def needs_escalation(data):
+    """Escalation policy for clause assessments: returns a reason, or None if the answer can stand."""
+    if data.get("score", 0) is None or data.get("quality") == "failed": return "incomplete"
+    if str(data.get("label", "")).capitalize() == "High": return "high_risk"
+    if data.get("is_ambiguous") is True: return "ambiguous"
+    try:
+        if float(data.get("confidence", 1.0)) < MIN_CONFIDENCE: return "low_confidence"
+    except (TypeError, ValueError):
+        return "low_confidence"
+    return None
+
+class Tier:
+    """
+    One model in the cascade. backend(model, prompt) returns the raw completion text.
+    concurrency caps in-flight calls; budget_per_hour (rupees, None = unlimited) is a
+    rolling one-hour spend limit, after which the tier is skipped until spend ages out.
+    """
+    def __init__(self, name, model, backend, concurrency=4, rupees_per_1k_tokens=0.0, budget_per_hour=None):
+        self.name = name
+        self.model = model
+        self.backend = backend
+        self.rupees_per_1k_tokens = rupees_per_1k_tokens
+        self.budget_per_hour = budget_per_hour
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._spend = deque()  # (timestamp, rupees)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.total_spend = 0.0
+
+    def within_budget(self):
+        if self.budget_per_hour is None: return True
+        cutoff = time.time() - 3600
+        with self._lock:
+            while self._spend and self._spend[0][0] < cutoff: self._spend.popleft()
+            return sum(r for _, r in self._spend) < self.budget_per_hour
+
+    def call(self, prompt):
+        with self._slots:
+            raw = self.backend(self.model, prompt)
+        # ~4 characters per token is close enough for budgeting
+        cost = (len(prompt) + len(raw or "")) / 4 / 1000 * self.rupees_per_1k_tokens
+        with self._lock:
+            self._spend.append((time.time(), cost))
+            self.calls += 1
+            self.total_spend += cost
+        return raw
+
+class Cascade:
+    """
+    Runs every prompt on the first tier and escalates to the next one while
+    needs_escalation(result) returns a reason (or the output does not parse).
+    parse(raw, retry) turns a reply into a dict (None if unusable); retry(extra) re-asks
+    the same tier with extra instructions appended to the prompt.
+    The returned dict records which tier produced it ("tier", "model") and, when
+    escalation happened, why ("escalation_reason"). Backend errors are retried on the
+    same tier with exponential backoff and only then count as "backend_error".
+    """
+    def __init__(self, tiers, parse=lambda raw, retry: json.loads(raw), needs_escalation=lambda data: None,
+                 retries=BACKEND_RETRIES, backoff=BACKEND_BACKOFF):
+        self.tiers = tiers
+        self.parse = parse
+        self.needs_escalation = needs_escalation
+        self.retries = retries
+        self.backoff = backoff
+        self.escalations = 0
+        self.backend_errors = 0
+        self._lock = threading.Lock()
+
+    def _call(self, tier, prompt):
+        for attempt in range(self.retries + 1):
+            try:
+                return tier.call(prompt)
+            except Exception:
+                with self._lock: self.backend_errors += 1
+                if attempt == self.retries: raise
+                time.sleep(self.backoff * 2 ** attempt)
+
+    def run(self, prompt):
+        result, reason = None, None
+        for i, tier in enumerate(self.tiers):
+            if not tier.within_budget(): continue
+            try:
+                raw = self._call(tier, prompt)
+            except Exception:
+                data, step_reason = None, "backend_error"
+            else:
+                try:
+                    data = self.parse(raw, lambda extra, tier=tier: self._call(tier, prompt + extra))
+                    if not isinstance(data, dict): raise ValueError("not a JSON object")
+                except Exception:
+                    data, step_reason = None, "invalid_json"
+            if data is not None:
+                step_reason = self.needs_escalation(data)
+                data = dict(data, tier=tier.name, model=tier.model)
+                if reason: data["escalation_reason"] = reason
+                result = data
+            if not step_reason: return result
+            reason = step_reason
+            if i + 1 < len(self.tiers):
+                with self._lock: self.escalations += 1
+        # Out of tiers (or budget) with an answer we cannot vouch for: keep the best one but say so
+        if result is not None and reason in UNRESOLVED_REASONS: result["unresolved"] = reason
+        return result
+
+    def stats(self):
+        return {
+            "escalations": self.escalations,
+            "backend_errors": self.backend_errors,
+            "calls": {t.name: t.calls for t in self.tiers},
+            "spend_rupees": {t.name: round(t.total_spend, 4) for t in self.tiers},
+        }
+
+# --- OFFLINE STAND-IN BACKENDS ---
+class SimulatedBackend:
+    """
+    Fake model for offline runs: sleeps `latency` seconds and returns an assessment
+    JSON whose quality is controlled by invalid_rate (broken JSON) and
+    unsure_rate (low confidence / ambiguous answers).
+    """
+    def __init__(self, latency, invalid_rate=0.0, unsure_rate=0.0, high_rate=0.15, seed=0):
+        self.latency = latency
+        self.invalid_rate = invalid_rate
+        self.unsure_rate = unsure_rate
+        self.high_rate = high_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __call__(self, model, prompt):
+        time.sleep(self.latency)
+        with self._lock:
+            broken = self._rng.random() < self.invalid_rate
+            unsure = self._rng.random() < self.unsure_rate
+            high = self._rng.random() < self.high_rate
+        if broken: return '{"clause_title": "Payment", "score": 70,'
+        score = 80 if high else 35
+        return json.dumps({
+            "clause_title": "Simulated Clause", "clause_type": "General", "modality": "OBLIGATION",
+            "score": score, "label": "High" if high else "Medium",
+            "explanation": f"Simulated by {model}.", "legal_reference": "Compliant with ICA 1872",
+            "deviation": "Standard", "alternative_clause": "Consult legal counsel.",
+            "is_ambiguous": unsure, "confidence": 0.4 if unsure else 0.9,
+        })
+
+def _throughput(cascade, prompts, workers):
+    from concurrent.futures import ThreadPoolExecutor
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=workers) as pool: list(pool.map(cascade.run, prompts))
+    elapsed = time.time() - start
+    spend = sum(t.total_spend for t in cascade.tiers)
+    return elapsed, spend
+
+if __name__ == "__main__":
+    # Offline comparison: fast->strong cascade vs. the strong model alone
+    prompts = ["Analyze this clause under INDIAN LAW. " + "x" * 1500] * 200
+
+    def strong(): return SimulatedBackend(latency=0.4, invalid_rate=0.01, unsure_rate=0.02, seed=2)
+    cascade = Cascade([
+        Tier("fast", "sim-8b", SimulatedBackend(latency=0.05, invalid_rate=0.05, unsure_rate=0.1, seed=1), 8, FAST_COST),
+        Tier("strong", "sim-70b", strong(), 2, STRONG_COST),
+    ], needs_escalation=needs_escalation)
+    single = Cascade([Tier("strong", "sim-70b", strong(), 2, STRONG_COST)], needs_escalation=needs_escalation)
+
+    for name, c in [("cascade", cascade), ("strong only", single)]:
+        elapsed, spend = _throughput(c, prompts, workers=8)
+        print(f"{name:12s} {len(prompts) / elapsed:6.1f} clauses/s  Rs.{spend:.3f}  {len(prompts) / spend:8.0f} clauses per rupee  {c.stats()}")
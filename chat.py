@@ -0,0 +1,52 @@
+import os
+from legal_engine import stream_llm
+
+CONTEXT_CHARS = 4000
+# Rough budget for past turns sent back to the model (~4 characters per token)
+HISTORY_TOKEN_BUDGET = int(os.getenv("LEGAL_AI_CHAT_HISTORY_TOKENS", 1500))
+
+def build_context(contract_text):
+    """
+    System block for one contract. Build it once per analysis and keep it with the session
+    (st.session_state / AnalysisReport.chat_context); the byte-identical block on every turn
+    also lets the provider reuse the prompt prefix.
+    """
+    return (
+        "You are an expert Indian Legal Auditor. Answer questions about the contract below "
+        "professionally and concisely, citing Indian Law (e.g. Indian Contract Act, 1872) where relevant.\n\n"
+        f"CONTRACT:\n{contract_text[:CONTEXT_CHARS]}"
+    )
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+def normalize_history(history):
+    """Accepts Streamlit-style role/content dicts or Gradio [user, bot] pairs."""
+    messages = []
+    for item in history or []:
+        if isinstance(item, dict):
+            messages.append({"role": item["role"], "content": item["content"]})
+        else:
+            user, bot = item
+            if user: messages.append({"role": "user", "content": user})
+            if bot: messages.append({"role": "assistant", "content": bot})
+    return messages
+
+def trim_history(messages, budget=HISTORY_TOKEN_BUDGET):
+    """Keeps the most recent turns that fit in the token budget, oldest dropped first."""
+    kept, used = [], 0
+    for m in reversed(messages):
+        used += estimate_tokens(m["content"])
+        if used > budget: break
+        kept.append(m)
+    kept.reverse()
+    # Never open on a dangling assistant reply
+    while kept and kept[0]["role"] != "user": kept.pop(0)
+    return kept
+
+def stream_chat_response(context, history, query):
+    """Yields the answer piece by piece, using the context block from build_context and recent conversation."""
+    messages = [{"role": "system", "content": context}]
+    messages += trim_history(normalize_history(history))
+    messages.append({"role": "user", "content": query})
+    yield from stream_llm(messages)
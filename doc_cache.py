@@ -0,0 +1,119 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from legal_engine import PROMPT_VERSION
+from records import AnalysisReport
+
+# Bump when segmentation, scoring or report layout changes so old entries stop matching
+PIPELINE_VERSION = "3"
+
+CACHE_DIR = os.getenv("LEGAL_AI_CACHE_DIR", "doc_cache")
+MAX_ENTRIES = int(os.getenv("LEGAL_AI_CACHE_ENTRIES", 500))
+TTL_SECONDS = int(os.getenv("LEGAL_AI_CACHE_TTL", 7 * 24 * 3600))
+
+ENTRY_FILE = "entry.json"
+
+def fingerprint(data):
+    """Content hash of the uploaded bytes plus pipeline and prompt versions."""
+    h = hashlib.sha256()
+    h.update(f"pipeline={PIPELINE_VERSION};prompt={PROMPT_VERSION};".encode())
+    h.update(data)
+    return h.hexdigest()
+
+class DocumentCache:
+    """
+    Content-addressed store of finished analyses: doc_cache/<fingerprint>/ holds the
+    compact AnalysisReport (entry.json) and, once anyone has downloaded them, the audit
+    JSON and PDF built by the report itself. Entries expire after ttl seconds
+    and the least recently used ones are dropped beyond max_entries. A small in-memory
+    layer keeps the hottest entries so repeats skip the disk read as well.
+    """
+    def __init__(self, root=CACHE_DIR, max_entries=MAX_ENTRIES, ttl=TTL_SECONDS, hot_entries=32):
+        self.root = root
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hot_entries = hot_entries
+        self._hot = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _dir(self, key):
+        return os.path.join(self.root, key)
+
+    def get(self, key):
+        """Returns the cached AnalysisReport (artifacts served from the entry folder) or None."""
+        path = self._dir(key)
+        entry_path = os.path.join(path, ENTRY_FILE)
+        with self._lock:
+            entry = self._hot.get(key)
+            if entry is None:
+                try:
+                    with open(entry_path) as f: entry = json.load(f)
+                except (OSError, ValueError):
+                    return None
+            if time.time() - entry["created_at"] > self.ttl:
+                self._hot.pop(key, None)
+                shutil.rmtree(path, ignore_errors=True)
+                return None
+            self._hot[key] = entry
+            self._hot.move_to_end(key)
+            while len(self._hot) > self.hot_entries: self._hot.popitem(last=False)
+
+        # mtime doubles as the LRU clock shared by every process using this folder
+        try: os.utime(entry_path)
+        except OSError: pass
+        report = AnalysisReport.from_dict(entry["report"], artifact_dir=path)
+        report.cache_entry = entry_path
+        return report
+
+    def put(self, key, report):
+        """
+        Stores a finished analysis. The entry is built in a temp folder and renamed into place;
+        afterwards report.artifact_dir points at it so downloads land in the shared entry.
+        """
+        entry = {"created_at": time.time(), "report": report.to_dict()}
+        path = self._dir(key)
+        entry_path = os.path.join(path, ENTRY_FILE)
+        tmp = tempfile.mkdtemp(prefix=".tmp_", dir=self.root)
+        try:
+            with open(os.path.join(tmp, ENTRY_FILE), "w") as f: json.dump(entry, f)
+            try:
+                os.rename(tmp, path)
+            except OSError:
+                if os.path.exists(entry_path): raise
+                # Leftover folder without an entry (e.g. artifacts of an evicted entry): replace it
+                shutil.rmtree(path, ignore_errors=True)
+                os.rename(tmp, path)
+        except OSError:
+            # Another worker stored the same document first; keep theirs
+            shutil.rmtree(tmp, ignore_errors=True)
+        if os.path.exists(entry_path): report.artifact_dir, report.cache_entry = path, entry_path
+        self._evict()
+
+    def _evict(self):
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            entry_path = os.path.join(path, ENTRY_FILE)
+            if not os.path.exists(entry_path):
+                # Abandoned temp folders and entry-less leftovers are swept once they are an hour old
+                try: stale = now - os.path.getmtime(path) > 3600
+                except OSError: stale = False
+                if stale: shutil.rmtree(path, ignore_errors=True)
+                continue
+            entries.append((os.path.getmtime(entry_path), name))
+
+        entries.sort()
+        expired = [name for mtime, name in entries if now - os.path.getctime(os.path.join(self.root, name)) > self.ttl]
+        overflow = [name for _, name in entries[:max(0, len(entries) - self.max_entries)]]
+        for name in set(expired + overflow):
+            with self._lock: self._hot.pop(name, None)
+            shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+document_cache = DocumentCache()
@@ -0,0 +1,221 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import threading
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from processor import extract_text, segment_into_clauses, process_multilingual_clause, get_entities
+from legal_engine import get_risk_assessment, calculate_overall_risk, classify_contract, generate_executive_summary
+from records import ClauseResult, AnalysisReport, SCRATCH_DIR, SCRATCH_TTL, sweep_folders
+from doc_cache import document_cache
+
+ARTIFACT_ROOT = os.getenv("LEGAL_AI_JOB_DIR", "jobs")
+KB_DIR = "audit_logs"
+CLAUSE_WORKERS = int(os.getenv("LEGAL_AI_CLAUSE_WORKERS", 4))
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+class JobCancelled(Exception):
+    pass
+
+# --- PIPELINE ---
+def analyze_document(raw_text, on_progress=None, is_cancelled=None, doc_type=None, entities=None):
+    """
+    Full analysis pipeline shared by both UIs.
+    Clauses are assessed concurrently (LEGAL_AI_CLAUSE_WORKERS) and kept in document order.
+    on_progress(done, total) is called after every clause; is_cancelled() is checked
+    before each clause so a cancelled job stops spending LLM calls.
+    Pass doc_type / entities when the caller has already computed them; otherwise they
+    are computed here so every cached report carries them.
+    """
+    doc_type = doc_type or classify_contract(raw_text)
+    clauses = segment_into_clauses(raw_text)
+    results = [None] * len(clauses)
+
+    def assess(i):
+        if is_cancelled and is_cancelled(): return
+        c = clauses[i]
+        clean_text, _ = process_multilingual_clause(c['content'])
+        analysis = get_risk_assessment(clean_text)
+        results[i] = ClauseResult.from_analysis(c['header'], c['start'], c['end'], analysis)
+
+    # Clauses are independent; the cascade tiers cap how many calls each model actually sees
+    with ThreadPoolExecutor(max_workers=CLAUSE_WORKERS) as pool:
+        futures = [pool.submit(assess, i) for i in range(len(clauses))]
+        for done, future in enumerate(as_completed(futures), 1):
+            future.result()
+            if on_progress: on_progress(done, len(clauses))
+
+    if is_cancelled and is_cancelled(): raise JobCancelled()
+    if entities is None:
+        from utils import format_entities  # utils pulls in fpdf, so only load it here
+        entities = format_entities(get_entities(raw_text))
+    return AnalysisReport(raw_text, doc_type, generate_executive_summary(raw_text), calculate_overall_risk(results), results, entities)
+
+def file_audit_log(report, name):
+    """Files the analysis in the knowledge base (audit_logs/), which the sidebar counter reads."""
+    os.makedirs(KB_DIR, exist_ok=True)
+    with open(os.path.join(KB_DIR, f"log_{name}.json"), "w") as f: json.dump(report.audit_log(), f, indent=4)
+
+# --- JOB QUEUE ---
+class Job:
+    def __init__(self, user_id, file_path, file_ext, cache_key=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.user_id = user_id
+        self.file_path = file_path
+        self.file_ext = file_ext
+        self.cache_key = cache_key
+        self.state = QUEUED
+        self.progress = (0, 0)
+        self.report = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.out_dir = os.path.join(ARTIFACT_ROOT, self.id)
+
+    def snapshot(self):
+        wait_until = self.started_at or time.time()
+        return {
+            "id": self.id,
+            "state": self.state,
+            "progress": self.progress,
+            "wait_seconds": round(wait_until - self.submitted_at, 2),
+            "error": self.error,
+        }
+
+class JobQueue:
+    """
+    Submit-and-poll wrapper around analyze_document with a local worker pool.
+    Each user gets their own FIFO and workers take turns across users (round robin),
+    so one user uploading a burst of contracts cannot push everyone else to the back.
+    """
+    def __init__(self, workers=None, max_finished=200):
+        self.workers = workers or int(os.getenv("LEGAL_AI_WORKERS", 2))
+        self.max_finished = max_finished
+        self._cond = threading.Condition()
+        self._queues = OrderedDict()   # user_id -> deque of Jobs, in round-robin order
+        self._jobs = OrderedDict()     # job_id -> Job
+        self._running = 0
+        self._waits = deque(maxlen=100)
+        self._counts = {DONE: 0, FAILED: 0, CANCELLED: 0}
+        self._expired_dirs = []
+        for i in range(self.workers):
+            threading.Thread(target=self._worker, name=f"legal-ai-worker-{i}", daemon=True).start()
+
+    def submit(self, user_id, file_path, file_ext, cache_key=None):
+        """cache_key (a doc_cache fingerprint) makes the worker store the finished analysis."""
+        job = Job(user_id, file_path, file_ext, cache_key)
+        with self._cond:
+            self._jobs[job.id] = job
+            self._queues.setdefault(user_id, deque()).append(job)
+            self._cond.notify()
+        return job.id
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def status(self, job_id):
+        job = self._jobs.get(job_id)
+        if not job: return None
+        with self._cond:
+            snap = job.snapshot()
+            if job.state == QUEUED: snap["position"] = self._position(job)
+        return snap
+
+    def cancel(self, job_id):
+        """Queued jobs are dropped immediately; running jobs stop at the next clause."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if not job or job.state in (DONE, FAILED, CANCELLED): return False
+            job.cancel_event.set()
+            if job.state == QUEUED:
+                q = self._queues.get(job.user_id)
+                if q and job in q: q.remove(job)
+                if q is not None and not q: del self._queues[job.user_id]
+                self._finish(job, CANCELLED)
+        return True
+
+    def metrics(self):
+        with self._cond:
+            waits = list(self._waits)
+            return {
+                "workers": self.workers,
+                "queue_depth": sum(len(q) for q in self._queues.values()),
+                "waiting_users": len(self._queues),
+                "running": self._running,
+                "avg_wait_seconds": round(sum(waits) / len(waits), 2) if waits else 0.0,
+                "max_wait_seconds": round(max(waits), 2) if waits else 0.0,
+                "completed": self._counts[DONE],
+                "failed": self._counts[FAILED],
+                "cancelled": self._counts[CANCELLED],
+            }
+
+    # --- internals (caller holds self._cond) ---
+    def _position(self, job):
+        # Jobs ahead = everything that round robin will hand out before this one
+        queues = list(self._queues.values())
+        rank = next(i for i, q in enumerate(queues) if job in q)
+        depth = list(queues[rank]).index(job)
+        return sum(min(len(q), depth + (1 if i < rank else 0)) for i, q in enumerate(queues)) + 1
+
+    def _next_job(self):
+        user_id, q = next(iter(self._queues.items()))
+        job = q.popleft()
+        # Rotate this user to the back so the next worker serves someone else
+        del self._queues[user_id]
+        if q: self._queues[user_id] = q
+        return job
+
+    def _finish(self, job, state):
+        job.state = state
+        job.finished_at = time.time()
+        self._counts[state] += 1
+        finished = [j for j in self._jobs.values() if j.state in (DONE, FAILED, CANCELLED)]
+        expired = [j for j in finished if j.finished_at < time.time() - SCRATCH_TTL]
+        for old in set(expired + finished[:max(0, len(finished) - self.max_finished)]):
+            del self._jobs[old.id]
+            self._expired_dirs.append(old.out_dir)
+
+    def _cleanup(self):
+        # Outside the lock: folders of forgotten jobs, plus anything older than a day that a
+        # late download recreated and the private scratch folders of downloads and templates
+        with self._cond: dirs, self._expired_dirs = self._expired_dirs, []
+        for path in dirs: shutil.rmtree(path, ignore_errors=True)
+        sweep_folders(ARTIFACT_ROOT)
+        sweep_folders(SCRATCH_DIR)
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._queues: self._cond.wait()
+                job = self._next_job()
+                job.state = RUNNING
+                job.started_at = time.time()
+                self._waits.append(job.started_at - job.submitted_at)
+                self._running += 1
+            state = self._run(job)
+            with self._cond:
+                self._running -= 1
+                self._finish(job, state)
+            self._cleanup()
+
+    def _run(self, job):
+        def progress(done, total): job.progress = (done, total)
+        try:
+            with open(job.file_path, "rb") as f: raw_text = extract_text(f, job.file_ext)
+            job.report = analyze_document(raw_text, on_progress=progress, is_cancelled=job.cancel_event.is_set)
+            # Downloads are built later, on request, into the cache entry (or this job's folder)
+            job.report.artifact_dir = job.out_dir
+            # Degraded analyses are not cached, so the next upload gets a fresh attempt
+            if job.cache_key and job.report.is_complete(): document_cache.put(job.cache_key, job.report)
+            file_audit_log(job.report, job.id)
+            return DONE
+        except JobCancelled:
+            return CANCELLED
+        except Exception as e:
+            job.error = str(e)
+            return FAILED
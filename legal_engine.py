@@ -1,42 +1,58 @@
 import os
-import json
 from dotenv import load_dotenv
 from groq import Groq
+from cascade import Cascade, Tier, needs_escalation, FAST_COST, STRONG_COST
+from structured import parse_assessment, unassessed
 
 load_dotenv()
 client = Groq(api_key=os.getenv("GROQ_API_KEY"))
 
-def call_llm(prompt, is_json=True):
+# Bump whenever a prompt or the model changes; it is part of the document cache key
+PROMPT_VERSION = "3"
+
+FAST_MODEL = os.getenv("LEGAL_AI_FAST_MODEL", "llama-3.1-8b-instant")
+STRONG_MODEL = os.getenv("LEGAL_AI_STRONG_MODEL", "llama-3.3-70b-versatile")
+
+def _optional_float(name):
+    value = os.getenv(name)
+    return float(value) if value else None
+
+def _complete(model, prompt, is_json):
+    completion = client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": "You are an expert Indian Legal Auditor. Output valid JSON only when requested."}, 
+            {"role": "user", "content": prompt}
+        ], 
+        response_format={"type": "json_object"} if is_json else None,
+        temperature=0.3
+    )
+    return completion.choices[0].message.content
+
+def call_llm(prompt):
+    """Plain-text completion on the fast model (classification, summary, translation)."""
     try:
-        model_name = "llama-3.1-8b-instant" 
-        completion = client.chat.completions.create(
-            model=model_name,
-            messages=[
-                {"role": "system", "content": "You are an expert Indian Legal Auditor. Output valid JSON only when requested."}, 
-                {"role": "user", "content": prompt}
-            ], 
-            response_format={"type": "json_object"} if is_json else None,
-            temperature=0.3
-        )
-        content = completion.choices[0].message.content
-        return json.loads(content) if is_json else content.strip()
+        return _complete(FAST_MODEL, prompt, is_json=False).strip()
     except Exception as e:
         # Fallback
-        if is_json:
-            return {
-                "clause_title": "General Clause", 
-                "clause_type": "General", 
-                "score": 50, 
-                "label": "Medium", 
-                "explanation": "Standard review.", 
-                "legal_reference": "Indian Contract Act, 1872",
-                "alternative_clause": "Consult legal counsel.",
-                "modality": "OBLIGATION",
-                "is_ambiguous": False, 
-                "deviation": "Standard"
-            }
         return "Legal Document"
 
+# --- MODEL CASCADE (clause assessment) ---
+def groq_json_backend(model, prompt):
+    return _complete(model, prompt, is_json=True)
+
+# Every clause goes to the fast tier; High / ambiguous / low-confidence / unparseable answers go to the strong tier
+risk_cascade = Cascade([
+    Tier("fast", FAST_MODEL, groq_json_backend,
+         concurrency=int(os.getenv("LEGAL_AI_FAST_CONCURRENCY", 8)),
+         rupees_per_1k_tokens=FAST_COST,
+         budget_per_hour=_optional_float("LEGAL_AI_FAST_BUDGET")),
+    Tier("strong", STRONG_MODEL, groq_json_backend,
+         concurrency=int(os.getenv("LEGAL_AI_STRONG_CONCURRENCY", 2)),
+         rupees_per_1k_tokens=STRONG_COST,
+         budget_per_hour=_optional_float("LEGAL_AI_STRONG_BUDGET")),
+], parse=parse_assessment, needs_escalation=needs_escalation)
+
 def get_risk_assessment(clause_text):
     categories = "Termination, Indemnity, Non-Compete, Penalty, Arbitration, Payment, Liability, Intellectual Property, Auto-Renewal, Lock-in, Confidentiality, General"
     
@@ -50,24 +66,28 @@ def get_risk_assessment(clause_text):
     2. "clause_type": Choose from [{categories}].
     3. "modality": "OBLIGATION", "RIGHT", "PROHIBITION", "DEFINITION".
     4. "score": Risk score 0-100.
-    5. "label": "High", "Medium", "Low".
+    5. "label": "High" (score above 70), "Medium" (31-70), "Low" (0-30).
     6. "explanation": One sentence risk analysis.
     7. "legal_reference": CITE THE LAW (e.g., "Violates Section 27 of ICA 1872"). If standard, write "Compliant with ICA 1872".
     8. "deviation": "Strict" or "Standard".
     9. "alternative_clause": A fairer version compliant with Indian Law. (NEVER 'None').
     10. "is_ambiguous": boolean.
+    11. "confidence": How sure you are of this assessment, 0.0-1.0.
     """
-    return call_llm(prompt, is_json=True)
+    result = risk_cascade.run(prompt)
+    # Nothing salvageable from any tier: flag it for manual review rather than inventing a score
+    return result if result is not None else unassessed()
 
-def calculate_overall_risk(results):
-    if not results: return 0
-    total = sum([r['analysis'].get('score', 0) for r in results])
-    return round(total / len(results)) if len(results) > 0 else 0
+def calculate_overall_risk(clauses):
+    # Clauses that could not be assessed have no score and are left out of the average;
+    # None (not 0, which would read as "low risk") when nothing could be scored
+    scores = [c.score for c in clauses if c.score is not None]
+    return round(sum(scores) / len(scores)) if scores else None
 
 def classify_contract(text):
     # FORCE PLAIN TEXT RESPONSE
     prompt = f"Classify this legal document type (e.g. Employment Agreement). Return ONLY the name as a string. Do NOT return JSON. Text: {text[:400]}"
-    return call_llm(prompt, is_json=False)
+    return call_llm(prompt)
 
 def generate_executive_summary(full_text):
     prompt = f"""
@@ -76,8 +96,19 @@ def generate_executive_summary(full_text):
     
     Text: {full_text[:3000]}
     """
-    return call_llm(prompt, is_json=False)
+    return call_llm(prompt)
 
-def get_chat_response(context, query):
-    prompt = f"Context: {context[:4000]}\nQuery: {query}\nAnswer professionally citing Indian Law."
-    return call_llm(prompt, is_json=False)
\ No newline at end of file
+def stream_llm(messages):
+    """Yields the completion text piece by piece as the model generates it."""
+    try:
+        stream = client.chat.completions.create(
+            model=FAST_MODEL,
+            messages=messages,
+            temperature=0.3,
+            stream=True
+        )
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content
+            if delta: yield delta
+    except Exception as e:
+        yield "Sorry, the legal assistant is unavailable right now. Please try again."
\ No newline at end of file
@@ -2,7 +2,8 @@ import fitz
 import re
 import spacy
 import os
-import docx
+import zipfile
+import xml.etree.ElementTree as ET
 import streamlit as st
 from langdetect import detect, DetectorFactory
 from legal_engine import call_llm
@@ -20,6 +21,210 @@ def load_nlp():
     
 nlp = load_nlp()
     
+# --- DOCX STREAMING READER ---
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+MC = "{http://schemas.openxmlformats.org/markup-compatibility/2006}"
+
+def _roman(n):
+    vals = [(1000, "m"), (900, "cm"), (500, "d"), (400, "cd"), (100, "c"), (90, "xc"),
+            (50, "l"), (40, "xl"), (10, "x"), (9, "ix"), (5, "v"), (4, "iv"), (1, "i")]
+    out = ""
+    for v, sym in vals:
+        while n >= v:
+            out += sym
+            n -= v
+    return out
+
+def _letter(n):
+    # Word repeats the letter after z: a..z, aa..zz, aaa..
+    return chr(ord('a') + (n - 1) % 26) * ((n - 1) // 26 + 1)
+
+def _format_number(n, fmt):
+    if fmt == "lowerLetter": return _letter(n)
+    if fmt == "upperLetter": return _letter(n).upper()
+    if fmt == "lowerRoman": return _roman(n)
+    if fmt == "upperRoman": return _roman(n).upper()
+    return str(n)
+
+def _parse_level(lvl):
+    fmt = lvl.find(W + "numFmt")
+    txt = lvl.find(W + "lvlText")
+    start = lvl.find(W + "start")
+    style = lvl.find(W + "pStyle")
+    return (
+        fmt.get(W + "val") if fmt is not None else "decimal",
+        txt.get(W + "val", "") if txt is not None else "",
+        int(start.get(W + "val", 1)) if start is not None else 1,
+        style.get(W + "val") if style is not None else None,
+    )
+
+def _load_numbering(zf):
+    """
+    Reads numbering.xml into {numId: (counter_key, {ilvl: (fmt, lvlText, start, pStyle)})}.
+    A w:num with lvlOverride (new start or replacement level) gets its own counters,
+    which is how Word restarts a list that reuses another list's definition.
+    """
+    if "word/numbering.xml" not in zf.namelist(): return {}
+    root = ET.fromstring(zf.read("word/numbering.xml"))
+    abstracts = {}
+    for an in root.iter(W + "abstractNum"):
+        abstracts[an.get(W + "abstractNumId")] = {int(lvl.get(W + "ilvl", 0)): _parse_level(lvl) for lvl in an.findall(W + "lvl")}
+    numbering = {}
+    for num in root.iter(W + "num"):
+        ref = num.find(W + "abstractNumId")
+        if ref is None or ref.get(W + "val") not in abstracts: continue
+        aid, num_id = ref.get(W + "val"), num.get(W + "numId")
+        levels, key = abstracts[aid], aid
+        for override in num.findall(W + "lvlOverride"):
+            if levels is abstracts[aid]: levels, key = dict(levels), f"{aid}/{num_id}"
+            ilvl = int(override.get(W + "ilvl", 0))
+            lvl = override.find(W + "lvl")
+            if lvl is not None: levels[ilvl] = _parse_level(lvl)
+            start = override.find(W + "startOverride")
+            if start is not None and ilvl in levels:
+                levels[ilvl] = levels[ilvl][:2] + (int(start.get(W + "val", 1)),) + levels[ilvl][3:]
+        numbering[num_id] = (key, levels)
+    return numbering
+
+def _load_styles(zf, numbering):
+    """
+    Paragraph styles that number their paragraphs (headings usually do): {styleId: (numId, ilvl)}.
+    numPr is inherited through basedOn; a style without its own ilvl takes the list level
+    that names it in numbering.xml, else level 0.
+    """
+    if "word/styles.xml" not in zf.namelist(): return {}
+    root = ET.fromstring(zf.read("word/styles.xml"))
+    raw = {}
+    for style in root.iter(W + "style"):
+        if style.get(W + "type", "paragraph") != "paragraph": continue
+        based = style.find(W + "basedOn")
+        num_id = style.find(f"{W}pPr/{W}numPr/{W}numId")
+        ilvl = style.find(f"{W}pPr/{W}numPr/{W}ilvl")
+        raw[style.get(W + "styleId")] = (
+            based.get(W + "val") if based is not None else None,
+            num_id.get(W + "val") if num_id is not None else None,
+            int(ilvl.get(W + "val", 0)) if ilvl is not None else None,
+        )
+
+    styles = {}
+    for style_id in raw:
+        num_id = ilvl = None
+        current, seen = style_id, set()
+        while current in raw and current not in seen:
+            seen.add(current)
+            parent, own_num, own_ilvl = raw[current]
+            if num_id is None: num_id = own_num
+            if ilvl is None: ilvl = own_ilvl
+            current = parent
+        if num_id is None or num_id == "0": continue
+        if ilvl is None:
+            levels = numbering.get(num_id, (None, {}))[1]
+            ilvl = next((i for i, lvl in levels.items() if lvl[3] == style_id), 0)
+        styles[style_id] = (num_id, ilvl)
+    return styles
+
+def _numbering_label(numbering, counters, num_id, ilvl):
+    """Advances the list counter for (num_id, ilvl) and renders Word's label, e.g. '1.2' or '(a)'."""
+    if num_id not in numbering: return ""
+    key, levels = numbering[num_id]
+    if ilvl not in levels: return ""
+    fmt, lvl_text = levels[ilvl][:2]
+    state = counters.setdefault(key, {})
+    state[ilvl] = state.get(ilvl, levels[ilvl][2] - 1) + 1
+    for deeper in [k for k in state if k > ilvl]: del state[deeper]
+    if fmt == "bullet": return "•"
+    if fmt == "none": return ""
+
+    def sub(m):
+        lvl = int(m.group(1)) - 1
+        if lvl not in levels: return ""
+        return _format_number(state.get(lvl, levels[lvl][2]), levels[lvl][0])
+    return re.sub(r'%(\d)', sub, lvl_text)
+
+def extract_docx_text(file_obj):
+    """
+    Stream-parses word/document.xml with iterparse instead of loading the whole DOCX tree.
+    One line per paragraph (so segment_into_clauses sees the same layout as PDFs),
+    auto-numbering labels (direct or inherited from the paragraph style) rendered inline,
+    and table rows emitted as ' | '-joined cells. Text boxes come out as their own lines
+    after the paragraph that anchors them; rows of a nested table stay inside their cell.
+    """
+    file_obj.seek(0)
+    lines = []
+    with zipfile.ZipFile(file_obj) as zf:
+        numbering = _load_numbering(zf)
+        styles = _load_styles(zf, numbering)
+        counters = {}
+        body = None
+        fallback = 0  # inside mc:Fallback, which repeats the mc:Choice content for old readers
+        # Open paragraphs and tables, innermost last; a text box nests paragraphs inside a paragraph
+        stack = []
+
+        def emit(line, container):
+            if container is None: lines.append(line)
+            elif container["kind"] == "tbl": container["cell"].append(line)
+            else: container["boxes"].append(line)
+
+        def parent(depth):
+            return stack[depth - 1] if depth > 0 else None
+
+        with zf.open("word/document.xml") as xml:
+            for event, el in ET.iterparse(xml, events=("start", "end")):
+                tag = el.tag
+                if tag == MC + "Fallback":
+                    fallback += 1 if event == "start" else -1
+                    continue
+                if fallback: continue
+
+                if event == "start":
+                    if tag == W + "body": body = el
+                    elif tag == W + "p": stack.append({"kind": "p", "runs": [], "boxes": [], "style": None, "num_id": None, "ilvl": None})
+                    elif tag == W + "tbl": stack.append({"kind": "tbl", "row": [], "cell": []})
+                    continue
+
+                top = stack[-1] if stack else None
+                para_open = top is not None and top["kind"] == "p"
+                if tag == W + "t":
+                    if para_open: top["runs"].append(el.text or "")
+                elif tag == W + "tab":
+                    if para_open: top["runs"].append("\t")
+                elif tag in (W + "br", W + "cr"):
+                    if para_open: top["runs"].append("\n")
+                elif tag == W + "ilvl":
+                    if para_open: top["ilvl"] = int(el.get(W + "val", 0))
+                elif tag == W + "numId":
+                    if para_open: top["num_id"] = el.get(W + "val")
+                elif tag == W + "pStyle":
+                    if para_open: top["style"] = el.get(W + "val")
+                elif tag == W + "p":
+                    p = stack.pop()
+                    para = "".join(p["runs"]).strip()
+                    num_id, ilvl = p["num_id"], p["ilvl"]
+                    # Direct numPr wins over the paragraph style's; numId 0 switches numbering off
+                    if num_id is None and p["style"] in styles:
+                        num_id, style_ilvl = styles[p["style"]]
+                        if ilvl is None: ilvl = style_ilvl
+                    label = _numbering_label(numbering, counters, num_id, ilvl or 0) if num_id else ""
+                    if label and para: para = f"{label} {para}"
+                    container = parent(len(stack))
+                    if para: emit(para, container)
+                    for line in p["boxes"]: emit(line, container)
+                elif tag == W + "tc":
+                    if top and top["kind"] == "tbl":
+                        top["row"].append(" ".join(top["cell"]))
+                        top["cell"] = []
+                elif tag == W + "tr":
+                    if top and top["kind"] == "tbl":
+                        if any(top["row"]): emit(" | ".join(c for c in top["row"] if c), parent(len(stack) - 1))
+                        top["row"] = []
+                elif tag == W + "tbl":
+                    stack.pop()
+
+                # Drop finished top-level blocks so memory stays flat on long documents
+                if body is not None and not stack and tag in (W + "p", W + "tbl", W + "sectPr"):
+                    body.clear()
+    return "\n".join(lines)
+
 def extract_text(file_obj, file_extension):
     """Extracts text using the safe 'fitz' library."""
     text = ""
@@ -30,8 +235,7 @@ def extract_text(file_obj, file_extension):
             for page in doc:
                 text += page.get_text("text") + "\n"
         elif file_extension == '.docx':
-            doc = docx.Document(file_obj)
-            text = " ".join([para.text for para in doc.paragraphs])
+            text = extract_docx_text(file_obj)
         elif file_extension == '.txt':
             text = file_obj.read().decode('utf-8')
     except Exception as e:
@@ -60,9 +264,10 @@ def segment_into_clauses(raw_text):
     
     # If regex failed to split anything substantial, fallback to paragraph splitting
     if len(parts) < 3: 
-        return [{"header": "Contract Terms", "content": raw_text}]
+        return [{"header": "Contract Terms", "content": raw_text, "start": 0, "end": len(raw_text)}]
 
     current_header = "Preamble / Recital"
+    cursor = 0 # Parts come back in document order, so each clause is found after the previous one
     
     for part in parts:
         if not part or part.strip() == "": continue
@@ -78,7 +283,10 @@ def segment_into_clauses(raw_text):
             # It is content
             content = part.strip()
             if len(content) > 20: # Filter out tiny noise
-                clauses.append({"header": current_header, "content": content})
+                start = raw_text.find(content, cursor)
+                if start < 0: start = raw_text.find(content)
+                cursor = start + len(content)
+                clauses.append({"header": current_header, "content": content, "start": start, "end": cursor})
             
     return clauses
 
@@ -86,7 +294,7 @@ def process_multilingual_clause(content):
     try:
         if detect(content) == "hi":
             prompt = f"Translate this Hindi legal clause to English: {content}"
-            return call_llm(prompt, is_json=False), True
+            return call_llm(prompt), True
     except: pass
     return content, False
 
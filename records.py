@@ -0,0 +1,326 @@
+import os
+import json
+import time
+import shutil
+import tempfile
+import threading
+from enum import Enum
+
+# Private download/template folders live here and are swept once they are a day old
+SCRATCH_DIR = os.getenv("LEGAL_AI_SCRATCH_DIR", os.path.join(tempfile.gettempdir(), "legal_ai"))
+SCRATCH_TTL = int(os.getenv("LEGAL_AI_SCRATCH_TTL", 24 * 3600))
+
+def scratch_dir(prefix):
+    """New private temp folder for one report's downloads or one generated template."""
+    os.makedirs(SCRATCH_DIR, exist_ok=True)
+    return tempfile.mkdtemp(prefix=prefix, dir=SCRATCH_DIR)
+
+def sweep_folders(root, max_age=SCRATCH_TTL):
+    """Deletes folders under root that have not been touched for max_age seconds."""
+    cutoff = time.time() - max_age
+    try: names = os.listdir(root)
+    except OSError: return
+    for name in names:
+        path = os.path.join(root, name)
+        try: old = os.path.isdir(path) and os.path.getmtime(path) < cutoff
+        except OSError: old = False
+        if old: shutil.rmtree(path, ignore_errors=True)
+
+class Label(Enum):
+    LOW = "Low"
+    MEDIUM = "Medium"
+    HIGH = "High"
+    UNKNOWN = "Unknown"  # the model output could not be turned into an assessment
+
+    @classmethod
+    def parse(cls, value):
+        value = str(value or "").strip().capitalize()
+        return next((m for m in cls if m.value == value), cls.LOW)
+
+class Modality(Enum):
+    OBLIGATION = "OBLIGATION"
+    RIGHT = "RIGHT"
+    PROHIBITION = "PROHIBITION"
+    DEFINITION = "DEFINITION"
+
+    @classmethod
+    def parse(cls, value):
+        value = str(value or "").strip().upper()
+        return next((m for m in cls if m.value == value), cls.OBLIGATION)
+
+class ClauseType(Enum):
+    TERMINATION = "Termination"
+    INDEMNITY = "Indemnity"
+    NON_COMPETE = "Non-Compete"
+    PENALTY = "Penalty"
+    ARBITRATION = "Arbitration"
+    PAYMENT = "Payment"
+    LIABILITY = "Liability"
+    INTELLECTUAL_PROPERTY = "Intellectual Property"
+    AUTO_RENEWAL = "Auto-Renewal"
+    LOCK_IN = "Lock-in"
+    CONFIDENTIALITY = "Confidentiality"
+    GENERAL = "General"
+
+    @classmethod
+    def parse(cls, value):
+        # Models often answer "Indemnity Clause" or "non-compete", so match loosely
+        value = str(value or "").lower()
+        return next((m for m in cls if m.value.lower() in value), cls.GENERAL)
+
+class ClauseResult:
+    """
+    One assessed clause. Labels are enum members (shared singletons, not per-clause strings)
+    and the clause text is kept as offsets into the report's single copy of the contract.
+    """
+    __slots__ = ("header", "start", "end", "title", "clause_type", "modality", "label", "score",
+                 "is_ambiguous", "strict", "explanation", "legal_reference", "alternative_clause",
+                 "confidence", "tier", "escalation_reason", "quality", "model", "unresolved", "repairs")
+
+    def __init__(self, header, start, end, title, clause_type, modality, label, score, is_ambiguous,
+                 strict, explanation, legal_reference, alternative_clause, confidence=None, tier=None,
+                 escalation_reason=None, quality=None, model=None, unresolved=None, repairs=None):
+        self.header = header
+        self.start = start
+        self.end = end
+        self.title = title
+        self.clause_type = clause_type
+        self.modality = modality
+        self.label = label
+        self.score = score
+        self.is_ambiguous = is_ambiguous
+        self.strict = strict
+        self.explanation = explanation
+        self.legal_reference = legal_reference
+        self.alternative_clause = alternative_clause
+        self.confidence = confidence
+        self.tier = tier
+        self.escalation_reason = escalation_reason
+        self.quality = quality
+        self.model = model
+        self.unresolved = unresolved  # cascade ran out of tiers with an answer it could not vouch for
+        self.repairs = repairs        # local JSON/schema fixes applied to the model output
+
+    @classmethod
+    def from_analysis(cls, header, start, end, analysis):
+        """Builds a record from the assessment dict returned by get_risk_assessment."""
+        # score is None for clauses that could not be assessed (see structured.unassessed)
+        try: score = int(analysis["score"]) if analysis.get("score") is not None else None
+        except (TypeError, ValueError): score = None
+        return cls(
+            header, start, end,
+            title=analysis.get("clause_title") or header,
+            clause_type=ClauseType.parse(analysis.get("clause_type")),
+            modality=Modality.parse(analysis.get("modality")),
+            label=Label.parse(analysis.get("label")) if score is not None else Label.UNKNOWN,
+            score=score,
+            is_ambiguous=analysis.get("is_ambiguous") is True,
+            strict=str(analysis.get("deviation", "")).strip().lower() == "strict",
+            explanation=analysis.get("explanation", ""),
+            legal_reference=analysis.get("legal_reference", "Indian Contract Act, 1872"),
+            alternative_clause=analysis.get("alternative_clause", "Review required."),
+            confidence=analysis.get("confidence"),
+            tier=analysis.get("tier"),
+            escalation_reason=analysis.get("escalation_reason"),
+            quality=analysis.get("quality"),
+            model=analysis.get("model"),
+            unresolved=analysis.get("unresolved"),
+            repairs=analysis.get("repairs"),
+        )
+
+    @property
+    def deviation(self):
+        return "Strict" if self.strict else "Standard"
+
+    def analysis(self):
+        """The assessment in the original dict shape (clause_title, label, ...)."""
+        data = {
+            "clause_title": self.title,
+            "clause_type": self.clause_type.value,
+            "modality": self.modality.value,
+            "score": self.score,
+            "label": self.label.value,
+            "explanation": self.explanation,
+            "legal_reference": self.legal_reference,
+            "deviation": self.deviation,
+            "alternative_clause": self.alternative_clause,
+            "is_ambiguous": self.is_ambiguous,
+        }
+        for key in ("confidence", "tier", "model", "escalation_reason", "unresolved", "quality", "repairs"):
+            if getattr(self, key) is not None: data[key] = getattr(self, key)
+        return data
+
+    def to_row(self):
+        return [getattr(self, k).name if isinstance(getattr(self, k), Enum) else getattr(self, k) for k in self.__slots__]
+
+    @classmethod
+    def from_row(cls, row):
+        values = dict(zip(cls.__slots__, row))
+        values["clause_type"] = ClauseType[values["clause_type"]]
+        values["modality"] = Modality[values["modality"]]
+        values["label"] = Label[values["label"]]
+        return cls(**values)
+
+class AnalysisReport:
+    """
+    Everything one analysis produced. The contract text is stored once; clause text,
+    result dicts, the audit JSON and the PDF are all derived on demand. The two
+    artifacts are cached after the first request and, if artifact_dir is set, written
+    there so later sessions can serve the same files. cache_entry is the document cache's
+    entry file when artifact_dir is a cache folder, which can be evicted at any time.
+    """
+    __slots__ = ("text", "doc_type", "summary", "risk_score", "clauses", "entities",
+                 "artifact_dir", "cache_entry", "chat_context", "_audit_json", "_pdf_bytes")
+
+    JSON_FILE = "audit_log.json"
+    PDF_FILE = "Legal_AI_Report.pdf"
+
+    def __init__(self, text, doc_type, summary, risk_score, clauses, entities=None, artifact_dir=None):
+        self.text = text
+        self.doc_type = doc_type
+        self.summary = summary
+        self.risk_score = risk_score
+        self.clauses = clauses
+        self.entities = entities
+        self.artifact_dir = artifact_dir
+        self.cache_entry = None
+        self.chat_context = None  # chat system block, built on the first question (see chat.build_context)
+        self._audit_json = None
+        self._pdf_bytes = None
+
+    def clause_text(self, clause):
+        return self.text[clause.start:clause.end]
+
+    def has_type(self, clause_type):
+        return any(c.clause_type is clause_type for c in self.clauses)
+
+    def results(self):
+        """Clause results as the legacy list of {"header", "analysis", "original"} dicts."""
+        return [{"header": c.header, "analysis": c.analysis(), "original": self.clause_text(c)} for c in self.clauses]
+
+    def scored_count(self):
+        return sum(1 for c in self.clauses if c.score is not None)
+
+    def is_complete(self):
+        """False if any clause fell back to the unassessed placeholder; such reports are not cached."""
+        return all(c.score is not None and c.quality != "failed" for c in self.clauses)
+
+    def output_quality(self):
+        """How many clause assessments came back clean, repaired locally, re-asked or failed."""
+        counts = {"clean": 0, "repaired": 0, "reasked": 0, "failed": 0}
+        for c in self.clauses:
+            if c.quality in counts: counts[c.quality] += 1
+        return counts
+
+    def audit_log(self):
+        return {"doc_type": self.doc_type, "risk_score": self.risk_score,
+                "output_quality": self.output_quality(), "analysis": self.results()}
+
+    # --- on-demand artifacts ---
+    def _artifact_dir(self):
+        # Never recreate an evicted cache folder (it would have no entry and block later puts);
+        # from then on this report keeps its artifacts in a private temp folder
+        if self.cache_entry and not os.path.exists(self.cache_entry):
+            self.artifact_dir, self.cache_entry = scratch_dir("report_"), None
+        return self.artifact_dir
+
+    def _write_artifact(self, name, data, binary):
+        for _ in range(2):
+            path = os.path.join(self._artifact_dir(), name)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                if not self.cache_entry: os.makedirs(self.artifact_dir, exist_ok=True)
+                with open(tmp, "wb" if binary else "w") as f: f.write(data)
+                os.replace(tmp, path)
+                return path
+            except FileNotFoundError:
+                # The cache entry was evicted while we were writing; try again in a temp folder
+                if not self.cache_entry: raise
+                self.artifact_dir, self.cache_entry = scratch_dir("report_"), None
+
+    def _cached_artifact(self, name, build, binary):
+        directory = self._artifact_dir()
+        path = os.path.join(directory, name) if directory else None
+        if path and os.path.exists(path):
+            with open(path, "rb" if binary else "r") as f: return f.read()
+        data = build()
+        if path: self._write_artifact(name, data, binary)
+        return data
+
+    def audit_json(self):
+        if self._audit_json is None:
+            self._audit_json = self._cached_artifact(self.JSON_FILE, lambda: json.dumps(self.audit_log(), indent=4), binary=False)
+        return self._audit_json
+
+    def pdf_bytes(self):
+        if self._pdf_bytes is None:
+            # fpdf is only loaded once somebody actually asks for a PDF
+            from utils import generate_pdf_report
+            build = lambda: generate_pdf_report(self.doc_type, self.summary, self.clauses, self.risk_score)
+            self._pdf_bytes = self._cached_artifact(self.PDF_FILE, build, binary=True)
+        return self._pdf_bytes
+
+    def artifact_paths(self):
+        """Makes sure both artifacts exist in artifact_dir and returns (json_path, pdf_path)."""
+        paths = []
+        for name, data, binary in ((self.JSON_FILE, self.audit_json(), False), (self.PDF_FILE, self.pdf_bytes(), True)):
+            # Built earlier but the folder may have been evicted since; write the in-memory copy back out
+            path = os.path.join(self._artifact_dir(), name)
+            paths.append(path if os.path.exists(path) else self._write_artifact(name, data, binary))
+        return tuple(paths)
+
+    # --- persistence (document cache) ---
+    def to_dict(self):
+        return {
+            "text": self.text,
+            "doc_type": self.doc_type,
+            "summary": self.summary,
+            "risk_score": self.risk_score,
+            "entities": self.entities,
+            "clauses": [c.to_row() for c in self.clauses],
+        }
+
+    @classmethod
+    def from_dict(cls, data, artifact_dir=None):
+        clauses = [ClauseResult.from_row(row) for row in data["clauses"]]
+        return cls(data["text"], data["doc_type"], data["summary"], data["risk_score"], clauses,
+                   data.get("entities"), artifact_dir)
+
+if __name__ == "__main__":
+    # Per-session memory: old eager dict layout vs. AnalysisReport (PDF left out, fpdf not needed here)
+    import tracemalloc
+    clause = "The Employee shall not, for a period of two years after termination, engage in any competing business. " * 6
+    text = "\n".join(f"{i}. Clause\n{clause}" for i in range(1, 151))
+    analysis = {
+        "clause_title": "Non-Compete", "clause_type": "Non-Compete", "modality": "PROHIBITION", "score": 80,
+        "label": "High", "explanation": "Restraint of trade is void under Section 27.",
+        "legal_reference": "Violates Section 27 of ICA 1872", "deviation": "Strict",
+        "alternative_clause": "Limit the restriction to the term of employment.", "is_ambiguous": False,
+    }
+    spans = []
+    pos = 0
+    for i in range(150):
+        start = text.index(clause, pos)
+        spans.append((start, start + len(clause)))
+        pos = start + len(clause)
+
+    def measure(build):
+        tracemalloc.start()
+        keep = build()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return size, keep
+
+    def old_layout():
+        results = [{"header": f"{i}. Clause", "analysis": json.loads(json.dumps(analysis)), "original": text[s:e]}
+                   for i, (s, e) in enumerate(spans)]
+        return results, json.dumps({"doc_type": "NDA", "risk_score": 80, "analysis": results}, indent=4)
+
+    def new_layout():
+        clauses = [ClauseResult.from_analysis(f"{i}. Clause", s, e, json.loads(json.dumps(analysis)))
+                   for i, (s, e) in enumerate(spans)]
+        return AnalysisReport(text, "NDA", "summary", 80, clauses)
+
+    before, _ = measure(old_layout)
+    after, _ = measure(new_layout)
+    print(f"150 clauses: dicts + eager audit JSON {before / 1024:.0f} KiB -> AnalysisReport {after / 1024:.0f} KiB")
@@ -0,0 +1,245 @@
+import re
+import json
+import threading
+from records import ClauseType
+
+# --- ASSESSMENT SCHEMA ---
+# Fields we cannot invent locally; if they are still missing after repair, the model is re-asked for just these
+REQUIRED_FIELDS = ("score", "explanation", "alternative_clause")
+LABELS = ("Low", "Medium", "High")
+MODALITIES = ("OBLIGATION", "RIGHT", "PROHIBITION", "DEFINITION")
+DEVIATIONS = ("Strict", "Standard")
+FIELD_HINTS = {
+    "score": '"score": integer risk score 0-100',
+    "explanation": '"explanation": one sentence risk analysis',
+    "alternative_clause": '"alternative_clause": a fairer version compliant with Indian Law',
+}
+
+_stats = {"responses": 0, "clean": 0, "repaired": 0, "reasked": 0, "failed": 0}
+_stats_lock = threading.Lock()
+
+def _count(key):
+    with _stats_lock: _stats[key] += 1
+
+def quality_stats():
+    """Process-wide counts and rates of clean, locally repaired, re-asked and failed model outputs."""
+    with _stats_lock: stats = dict(_stats)
+    total = stats["responses"] or 1
+    for key in ("repaired", "reasked", "failed"):
+        stats[f"{key}_rate"] = round(stats[key] / total, 3)
+    return stats
+
+def label_for_score(score):
+    # Same bands the dashboards use for colouring the score
+    return "High" if score > 70 else "Medium" if score > 30 else "Low"
+
+# --- LOCAL JSON REPAIR ---
+def _split_strings(text):
+    """Splits text into ('str', '"..."') and ('code', ...) parts. Returns (parts, ended_inside_string)."""
+    parts, buf, in_str, esc = [], [], False, False
+    for ch in text:
+        if in_str:
+            buf.append(ch)
+            if esc: esc = False
+            elif ch == "\\": esc = True
+            elif ch == '"':
+                parts.append(["str", "".join(buf)])
+                buf, in_str = [], False
+        elif ch == '"':
+            if buf: parts.append(["code", "".join(buf)])
+            buf, in_str = [ch], True
+        else:
+            buf.append(ch)
+    if buf: parts.append(["str" if in_str else "code", "".join(buf)])
+    return parts, in_str
+
+def _close_truncated(parts):
+    """Drops a dangling key or half-written literal at the end and closes open braces/brackets."""
+    while parts:
+        kind, text = parts[-1]
+        if kind == "code":
+            text = text.rstrip().rstrip(",").rstrip()
+            m = re.search(r':\s*([A-Za-z]*)$', text)
+            if m and m.group(1) not in ("true", "false", "null"):
+                # "key": or "key": tru -> drop the whole pair
+                parts[-1][1] = text[:m.start()]
+                if len(parts) > 1 and parts[-2][0] == "str": del parts[-2]
+                continue
+            parts[-1][1] = text
+            if not text:
+                parts.pop()
+                continue
+            break
+        # A string right after '{' or ',' is a key with no value yet
+        prev = parts[-2][1].rstrip() if len(parts) > 1 else ""
+        if prev.endswith("{") or prev.endswith(","):
+            parts.pop()
+            continue
+        break
+
+    stack = []
+    for kind, text in parts:
+        if kind != "code": continue
+        for ch in text:
+            if ch in "{[": stack.append("}" if ch == "{" else "]")
+            elif ch in "}]" and stack: stack.pop()
+    return "".join(t for _, t in parts) + "".join(reversed(stack))
+
+def repair_json(raw, drop_truncated=False):
+    """
+    Parses a model reply as a JSON object, fixing the usual damage locally: code fences,
+    prose around the object, trailing commas, Python/unquoted booleans and truncation.
+    With drop_truncated, a value cut off at the end of the reply (an open string, or a bare
+    number that may have lost digits: "score": 8 could have been 85) is dropped with its key
+    instead of being kept as a partial value. Returns (dict or None, list of fixes applied).
+    """
+    text = (raw or "").strip()
+    fixes = []
+    try:
+        data = json.loads(text)
+        return (data, fixes) if isinstance(data, dict) else (None, fixes)
+    except ValueError:
+        pass
+
+    fence = re.search(r"```(?:json)?\s*(.*?)(?:```|$)", text, re.S)
+    if fence:
+        text = fence.group(1).strip()
+        fixes.append("code_fence")
+    start = text.find("{")
+    if start < 0: return None, fixes
+    if start > 0:
+        text = text[start:]
+        fixes.append("extra_text")
+
+    parts, open_string = _split_strings(text)
+    if open_string:
+        fixes.append("truncated")
+        is_value = len(parts) > 1 and parts[-2][1].rstrip().endswith(":")
+        if drop_truncated and is_value: parts.pop()  # _close_truncated then drops the dangling key
+        else: parts[-1][1] = parts[-1][1].rstrip("\\") + '"'
+    elif drop_truncated and parts and parts[-1][0] == "code":
+        m = re.search(r'([:\[,]\s*)-?\d[\d.]*(?:[eE][+-]?\d*)?\s*$', parts[-1][1])
+        if m:
+            parts[-1][1] = parts[-1][1][:m.end(1)]
+            fixes.append("truncated")
+    for part in parts:
+        if part[0] != "code": continue
+        fixed = re.sub(r",\s*([}\]])", r"\1", part[1])
+        fixed = re.sub(r"\b(True|TRUE|False|FALSE|None|NULL|Null)\b",
+                       lambda m: {"t": "true", "f": "false"}.get(m.group(1)[0].lower(), "null"), fixed)
+        if fixed != part[1]:
+            fixes.append("syntax")
+            part[1] = fixed
+
+    candidate = "".join(t for _, t in parts)
+    try:
+        # raw_decode ignores anything the model wrote after the object
+        data, _ = json.JSONDecoder().raw_decode(candidate)
+    except ValueError:
+        fixes.append("truncated")
+        try: data = json.loads(_close_truncated(parts))
+        except ValueError: return None, fixes
+    return (data, sorted(set(fixes))) if isinstance(data, dict) else (None, fixes)
+
+# --- SCHEMA VALIDATION ---
+def _as_text(value):
+    return value.strip() if isinstance(value, str) and value.strip() and value.strip().lower() != "none" else None
+
+def _as_bool(value):
+    if isinstance(value, bool): return value
+    return str(value).strip().lower() in ("true", "yes", "1")
+
+def _as_number(value):
+    if isinstance(value, bool): return None
+    if isinstance(value, (int, float)): return value
+    m = re.search(r"-?\d+(?:\.\d+)?", str(value or ""))
+    return float(m.group()) if m else None
+
+def validate_assessment(data):
+    """
+    Coerces a parsed reply onto the get_risk_assessment schema.
+    Returns (clean dict, missing required fields, fixes applied).
+    """
+    clean, fixes = {}, []
+
+    score = _as_number(data.get("score"))
+    if score is not None:
+        if not 0 <= score <= 100: fixes.append("score_range")
+        clean["score"] = int(round(min(100, max(0, score))))
+
+    label = str(data.get("label") or "").strip().capitalize()
+    if "score" in clean:
+        if label in LABELS and label != label_for_score(clean["score"]):
+            fixes.append("label_mismatch")
+        clean["label"] = label_for_score(clean["score"])
+    # Without a score the model's own label is not trusted; parse_assessment marks it Unknown
+
+    for key in ("explanation", "alternative_clause"):
+        value = _as_text(data.get(key))
+        if value: clean[key] = value
+
+    clean["clause_title"] = _as_text(data.get("clause_title"))
+    clause_type = ClauseType.parse(data.get("clause_type")).value
+    clean["clause_type"] = clause_type
+    modality = str(data.get("modality") or "").strip().upper()
+    clean["modality"] = modality if modality in MODALITIES else "OBLIGATION"
+    deviation = str(data.get("deviation") or "").strip().capitalize()
+    clean["deviation"] = deviation if deviation in DEVIATIONS else "Standard"
+    clean["legal_reference"] = _as_text(data.get("legal_reference")) or "Indian Contract Act, 1872"
+    clean["is_ambiguous"] = _as_bool(data.get("is_ambiguous", False))
+
+    confidence = _as_number(data.get("confidence"))
+    if confidence is not None:
+        if confidence > 1: confidence /= 100  # "85" or "85%"
+        clean["confidence"] = round(min(1.0, max(0.0, confidence)), 2)
+
+    missing = [key for key in REQUIRED_FIELDS if key not in clean]
+    return clean, missing, fixes
+
+def reask_prompt(missing):
+    keys = "\n".join(f"- {FIELD_HINTS[k]}" for k in missing)
+    return f"\n\nYour previous answer was missing or invalid for these keys. Return JSON with ONLY these keys:\n{keys}"
+
+def parse_assessment(raw, retry):
+    """
+    Cascade parser for clause assessments: repair locally, validate, and only if required
+    fields are still missing call retry(extra_instructions) once for just those fields.
+    A field whose text was cut off by truncation counts as missing, not as a short answer.
+    Returns None when the reply is not salvageable (the cascade then escalates).
+    """
+    _count("responses")
+    data, fixes = repair_json(raw, drop_truncated=True)
+    if data is None:
+        _count("failed")
+        return None
+    clean, missing, more_fixes = validate_assessment(data)
+    fixes += more_fixes
+    quality = "repaired" if fixes else "clean"
+
+    if missing:
+        quality = "reasked"
+        try: extra, _ = repair_json(retry(reask_prompt(missing)), drop_truncated=True)
+        except Exception: extra = None
+        if extra:
+            clean, missing, _ = validate_assessment(dict(data, **{k: extra[k] for k in missing if k in extra}))
+    if missing:
+        # Keep whatever was real; a missing score stays None (label Unknown) so it is not averaged in.
+        # A failed answer with a real score still counts, but the cascade escalates it as incomplete.
+        quality = "failed"
+        for key, value in unassessed().items(): clean.setdefault(key, value)
+    if clean.get("score") is None: clean["label"] = "Unknown"
+
+    _count(quality)
+    clean["quality"] = quality
+    if fixes: clean["repairs"] = sorted(set(fixes))
+    return clean
+
+def unassessed():
+    """Placeholder for a clause no tier could assess; excluded from the overall score."""
+    return {
+        "clause_title": None, "clause_type": "General", "modality": "OBLIGATION",
+        "score": None, "label": "Unknown",
+        "explanation": "Automatic assessment failed for this clause. Please review it manually.",
+        "legal_reference": "Indian Contract Act, 1872", "deviation": "Standard",
+        "alternative_clause": "Consult legal counsel.", "is_ambiguous": False, "quality": "failed",
+    }
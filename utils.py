@@ -69,7 +69,8 @@ class PDFReport(FPDF):
         self.set_text_color(128, 128, 128)
         self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
 
-def generate_pdf_report(doc_type, summary, results, score):
+def generate_pdf_report(doc_type, summary, clauses, score):
+    """Builds the audit PDF from ClauseResult records (see records.py)."""
     pdf = PDFReport()
     pdf.set_margins(15, 15, 15)
     pdf.set_auto_page_break(auto=True, margin=15)
@@ -86,9 +87,18 @@ def generate_pdf_report(doc_type, summary, results, score):
     
     # 2. SCORE
     pdf.set_font("Arial", 'B', 14)
-    color = (220, 53, 69) if score > 70 else (255, 193, 7) if score > 30 else (40, 167, 69)
-    pdf.set_text_color(*color)
-    pdf.cell(0, 10, f"RISK SCORE: {score}/100", ln=True)
+    if score is None:
+        pdf.set_text_color(128, 128, 128)
+        pdf.cell(0, 10, "RISK SCORE: Not scored / manual review", ln=True)
+    else:
+        color = (220, 53, 69) if score > 70 else (255, 193, 7) if score > 30 else (40, 167, 69)
+        pdf.set_text_color(*color)
+        pdf.cell(0, 10, f"RISK SCORE: {score}/100", ln=True)
+    scored = sum(1 for c in clauses if c.score is not None)
+    if scored < len(clauses):
+        pdf.set_font("Arial", '', 10)
+        pdf.set_text_color(128, 128, 128)
+        pdf.cell(0, 6, f"{scored} of {len(clauses)} clauses scored; the rest need manual review.", ln=True)
     pdf.set_text_color(0, 0, 0)
     pdf.ln(5)
     
@@ -107,14 +117,27 @@ def generate_pdf_report(doc_type, summary, results, score):
     pdf.cell(0, 8, "  DETAILED ANALYSIS", ln=True, fill=True)
     pdf.ln(5)
     
-    for r in results:
-        label = r['analysis'].get('label', 'Low')
+    for c in clauses:
+        label = c.label.value
         
-        if label in ["High", "Medium"]:
-            smart_title = r['analysis'].get('clause_title', r['header'])
-            law = r['analysis'].get('legal_reference', '')
-            explanation = r['analysis'].get('explanation', 'No details.')
-            advice = r['analysis'].get('alternative_clause', 'Review required.')
+        if label == "Unknown":
+            # Not assessed: still listed, so nobody mistakes it for a clause that passed
+            pdf.set_font("Arial", 'B', 10)
+            pdf.set_text_color(128, 128, 128)
+            pdf.cell(0, 6, f"[MANUAL REVIEW] {clean_text(c.title)}", ln=True)
+            pdf.set_text_color(0, 0, 0)
+            pdf.set_font("Arial", '', 9)
+            pdf.multi_cell(epw, 5, clean_text(c.explanation or "Automatic assessment failed for this clause. Please review it manually."))
+            pdf.ln(4)
+            pdf.set_draw_color(220, 220, 220)
+            pdf.line(15, pdf.get_y(), 15 + epw, pdf.get_y())
+            pdf.ln(4)
+
+        elif label in ["High", "Medium"]:
+            smart_title = c.title
+            law = c.legal_reference
+            explanation = c.explanation or 'No details.'
+            advice = c.alternative_clause or 'Review required.'
 
             # HEADER
             pdf.set_font("Arial", 'B', 10)
@@ -123,6 +146,9 @@ def generate_pdf_report(doc_type, summary, results, score):
             
             pdf.cell(0, 6, f"[{label.upper()}] {clean_text(smart_title)}", ln=True)
             pdf.set_text_color(0, 0, 0)
+            if c.unresolved:
+                pdf.set_font("Arial", 'I', 8)
+                pdf.cell(0, 5, f"Unverified ({c.unresolved}): no model could confirm this assessment.", ln=True)
             
             # RISK BODY
             pdf.set_font("Arial", '', 9)